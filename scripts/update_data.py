@@ -1,19 +1,46 @@
 #!/usr/bin/env python3
+import email.utils
+import gzip
+import hashlib
+import http.client
 import json
 import os
+import random
 import re
+import threading
 import time
 import urllib.parse
-import urllib.request
 import urllib.error
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson  # optional: much faster parse/dump, falls back to stdlib json
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # optional: stream-parse relics.json while it downloads (picks yajl2_c if built)
+except ImportError:
+    ijson = None
 
 DATA_DIR = "data"
 RELICS_OUT = os.path.join(DATA_DIR, "Relics.min.json")
 PRICES_OUT = os.path.join(DATA_DIR, "prices.json")
+# Sidecar for conditional WM refetches: {item: {"url_name", "etag", "last_modified", "ts"}}
+PRICES_META_OUT = os.path.join(DATA_DIR, "prices.meta.json")
+# Progress log while pricing (NDJSON, one {"item", "price", "meta"} per line).
+# Left behind by an interrupted run; the next run resumes from it.
+PRICES_PARTIAL_OUT = PRICES_OUT + ".ndjson"
+
+# Conditional-GET cache for the WFCD downloads: <key>.json body + <key>.meta.json
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
 
 MISSING_TXT = os.path.join(DATA_DIR, "missing_prices.txt")
 MISSING_JSON = os.path.join(DATA_DIR, "missing_prices.json")
+# Negative cache of items WM has no price for: {item: {"slugs": [...], "ts"}}
+WM_MISSING_OUT = os.path.join(DATA_DIR, "wm_missing.json")
 
 # -------------------- Relics sources --------------------
 # FULL relic rewards (includes vaulted + old relics) from WFCD warframe-drop-data
@@ -27,16 +54,33 @@ RELICS_VAULT_MAP_URL = (
 # -------------------- Warframe.market endpoints --------------------
 # Use ONLY statistics endpoint (orders endpoint can 403 from GitHub Actions IPs)
 WM_BASE = "https://api.warframe.market/v1"
-WM_ITEM_STATS = f"{WM_BASE}/items/{{url_name}}/statistics"
+WM_ITEMS_PREFIX = f"{WM_BASE}/items/"  # + url_name + "/statistics"
 
 UA = "mosestyle-warframe-relic/2.5 (+github pages actions)"
 
 WM_PLATFORM = "pc"
 WM_LANGUAGE = "en"
 
-# Throttling
-SLEEP_BETWEEN_WM_CALLS = 0.40  # ~2.5 req/sec
+# Throttling (global token bucket shared by all worker threads)
+WM_RATE_PER_SEC = 2.5
+WM_BURST = 1  # max calls allowed back-to-back after an idle period
+WM_ERROR_PENALTY = 1.25  # seconds all workers back off after a transient WM error
+# Workers only need to cover WM_RATE_PER_SEC x request latency (~1-3 in flight);
+# the rest wait in wm_bucket.acquire() with their slot reserved, so the next
+# call is always ready to go the moment a token frees up.
+WM_WORKERS = 8
 HTTP_TIMEOUT = 60
+MAX_REDIRECTS = 5  # same idea as urlopen's cap
+
+# Retry backoff: full jitter, sleep = uniform(0, min(cap, base * 2**attempt))
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 30.0
+RETRY_AFTER_MAX = 120.0  # don't let a server Retry-After stall the job for longer
+
+# Price cache (prices.json + prices.meta.json from the previous run)
+PRICE_FRESH_SECONDS = 24 * 3600  # prior price younger than this: no WM call at all
+REFRESH_FRACTION = 0.1  # random share of items refetched unconditionally every run
+WM_MISSING_TTL_SECONDS = 7 * 24 * 3600  # how long a known-missing item is skipped
 
 TIER_ORDER = {"Lith": 0, "Meso": 1, "Neo": 2, "Axi": 3}
 
@@ -45,47 +89,468 @@ def ensure_data_dir():
     os.makedirs(DATA_DIR, exist_ok=True)
 
 
-def http_json(url: str, timeout: int = HTTP_TIMEOUT, attempts: int = 4) -> Any:
+def json_loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8", errors="replace"))
+
+
+def json_dumps(obj: Any) -> bytes:
+    """
+    Compact UTF-8 JSON bytes (no trailing newline).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def load_json(path: str, default: Any) -> Any:
+    """
+    Read a previous run's output; missing or unreadable files give `default`.
+    """
+    try:
+        with open(path, "rb") as f:
+            return json_loads(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path: str, obj: Any, pretty: bool = False) -> None:
+    """
+    Compact by default (same as separators=(",", ":")), UTF-8, no ASCII escaping.
+    """
+    if orjson is not None:
+        opt = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=opt))
+        return
+
+    # json.dumps (not json.dump): only the one-shot path uses the C encoder,
+    # json.dump streams through the pure-Python one chunk by chunk.
+    if pretty:
+        text = json.dumps(obj, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": UA,
+    "Accept": "application/json,text/plain,*/*",
+    "Accept-Language": "en-US,en;q=0.9",
+    # JSON compresses well; http_get / http_stream_items decompress
+    "Accept-Encoding": "gzip",
+    # WM headers (harmless for WFCD endpoints)
+    "Platform": WM_PLATFORM,
+    "Language": WM_LANGUAGE,
+    # Helps with some WAF rules (doesn't hurt):
+    "Referer": "https://warframe.market/",
+    "Origin": "https://warframe.market",
+}
+
+# Idle keep-alive connections per host, shared by all worker threads.
+# Checked out LIFO, so at WM's paced rate the same warm connection serves
+# nearly every call and the TLS handshake is paid about once per run.
+_idle_conns: Dict[str, List[http.client.HTTPSConnection]] = {}
+_idle_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def _split_url(url: str) -> Tuple[str, str]:
+    """
+    "https://host/path?q" -> ("host", "/path?q")
+    """
+    u = urllib.parse.urlsplit(url)
+    path = u.path or "/"
+    if u.query:
+        path += "?" + u.query
+    return u.netloc, path
+
+
+def _checkout_conn(host: str, timeout: int) -> Tuple[http.client.HTTPSConnection, bool]:
+    """
+    (connection, reused) — reused is True when it came from the idle pool.
+    """
+    with _idle_lock:
+        idle = _idle_conns.get(host)
+        if idle:
+            return idle.pop(), True
+    return http.client.HTTPSConnection(host, timeout=timeout), False
+
+
+def _checkin_conn(host: str, conn: http.client.HTTPSConnection, close: bool = False) -> None:
+    if close:
+        conn.close()
+        return
+    with _idle_lock:
+        _idle_conns.setdefault(host, []).append(conn)
+
+
+def _pooled_get(
+    host: str, path: str, headers: Dict[str, str], timeout: int
+) -> Tuple[http.client.HTTPResponse, bytes]:
+    """
+    One GET on a pooled connection; returns (response, body) and puts the
+    connection back. An idle connection the server already closed is retried
+    once, right away, on a fresh connection (not counted as a failed attempt).
+    """
+    conn, reused = _checkout_conn(host, timeout)
+    while True:
+        try:
+            conn.request("GET", path, headers=headers)
+            r = conn.getresponse()
+            body = r.read()  # always drain so the connection can be reused
+            break
+        except Exception as e:
+            # Connection is in an unknown state; don't put it back in the pool
+            conn.close()
+            stale = isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError))
+            if not (reused and stale):
+                raise
+            conn, reused = http.client.HTTPSConnection(host, timeout=timeout), False
+    _checkin_conn(host, conn, close=r.will_close)
+    return r, body
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens/sec, holding at most `capacity`.
+    Tokens may go negative; that debt is how waiting callers queue up.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self) -> None:
+        """
+        Take one token, sleeping (outside the lock) until it is available.
+        If pause() is called while we sleep, the reserved slot is handed back
+        (so later callers don't inherit its debt) and we queue up again after
+        the pause.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                reserved = now >= self.paused_until
+                if reserved:
+                    self._refill()
+                    self.tokens -= 1
+                    wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+                else:
+                    wait = self.paused_until - now
+            if wait > 0:
+                time.sleep(wait)
+            if reserved:
+                with self.lock:
+                    if time.monotonic() >= self.paused_until:
+                        return
+                    self._refill()
+                    self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hand out no tokens for the next `seconds` (e.g. a server Retry-After).
+        Overlapping pauses don't stack; the later end wins.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def penalize(self, seconds: float) -> None:
+        """
+        Pre-drain `seconds` worth of tokens, pausing every caller.
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= seconds * self.rate
+
+
+wm_bucket = TokenBucket(WM_RATE_PER_SEC, WM_BURST)
+
+
+def _retry_after_seconds(err: urllib.error.HTTPError) -> float:
+    """
+    Retry-After header as seconds (delta-seconds or HTTP-date); 0 if absent/bad.
+    """
+    v = err.headers.get("Retry-After") if err.headers else None
+    if not v:
+        return 0.0
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(v).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _backoff(
+    attempt: int,
+    err: Optional[Exception] = None,
+    limiter: Optional[TokenBucket] = None,
+    final: bool = False,
+) -> None:
     """
-    Fetch JSON with retries/backoff.
+    Sleep before retry `attempt` using full jitter, so parallel workers that
+    failed together don't all retry together. Honors Retry-After on 429:
+    with a limiter it pauses every caller sharing it, otherwise just this one.
+    final: no retry follows, so only the limiter pause applies (no sleep).
+    """
+    retry_after = 0.0
+    if isinstance(err, urllib.error.HTTPError) and err.code == 429:
+        retry_after = min(RETRY_AFTER_MAX, _retry_after_seconds(err))
+    if limiter is not None and retry_after:
+        limiter.pause(retry_after)  # our own next acquire() waits it out too
+        retry_after = 0.0
+    if final:
+        return
+    delay = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * (2 ** attempt)))
+    time.sleep(max(delay, retry_after))
+
+
+def http_get(
+    url: str,
+    timeout: int = HTTP_TIMEOUT,
+    attempts: int = 4,
+    headers: Optional[Dict[str, str]] = None,
+    limiter: Optional[TokenBucket] = None,
+    _redirects: int = 0,
+) -> Tuple[bytes, http.client.HTTPMessage]:
+    """
+    GET with retries/backoff over a reused keep-alive connection.
+    Returns (body, response headers).
+    limiter: token bucket to take a token from before every attempt (retries
+    included), e.g. wm_bucket for warframe.market.
     Handles transient 429/5xx/connection issues.
+    Non-2xx responses (incl. 304 for conditional requests) raise
+    urllib.error.HTTPError (same as urlopen did).
     """
+    host, path = _split_url(url)
+    req_headers = {**DEFAULT_HEADERS, **headers} if headers else DEFAULT_HEADERS
     last_err = None
     for i in range(attempts):
+        if limiter is not None:
+            limiter.acquire()
         try:
-            req = urllib.request.Request(
-                url,
-                headers={
-                    "User-Agent": UA,
-                    "Accept": "application/json,text/plain,*/*",
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "Connection": "close",
-                    # WM headers (harmless for WFCD endpoints)
-                    "Platform": WM_PLATFORM,
-                    "Language": WM_LANGUAGE,
-                    # Helps with some WAF rules (doesn't hurt):
-                    "Referer": "https://warframe.market/",
-                    "Origin": "https://warframe.market",
-                },
+            r, body = _pooled_get(host, path, req_headers, timeout)
+        except Exception as e:
+            last_err = e
+            _backoff(i, final=i == attempts - 1)
+            continue
+
+        if r.status in (301, 302, 303, 307, 308) and r.getheader("Location"):
+            if _redirects >= MAX_REDIRECTS:
+                raise urllib.error.HTTPError(url, r.status, "too many redirects", r.headers, None)
+            return http_get(
+                urllib.parse.urljoin(url, r.getheader("Location")), timeout, attempts, headers, limiter, _redirects + 1
             )
-            with urllib.request.urlopen(req, timeout=timeout) as r:
-                raw = r.read().decode("utf-8", errors="replace")
-                return json.loads(raw)
+        if not 200 <= r.status < 300:
+            e = urllib.error.HTTPError(url, r.status, r.reason, r.headers, None)
+            if r.status in (429, 500, 502, 503, 504):
+                last_err = e
+                _backoff(i, e, limiter, final=i == attempts - 1)
+                continue
+            raise e
+
+        if (r.getheader("Content-Encoding") or "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return body, r.headers
+
+    if last_err:
+        raise last_err
+    raise RuntimeError("http_get failed with unknown error")
+
+
+def _cache_paths(cache_key: str) -> Tuple[str, str]:
+    return (
+        os.path.join(CACHE_DIR, cache_key + ".json"),
+        os.path.join(CACHE_DIR, cache_key + ".meta.json"),
+    )
+
+
+def _cache_request_headers(cache_key: str) -> Dict[str, str]:
+    """
+    If-None-Match / If-Modified-Since for a cached download, or {} when there
+    is no cache or the body doesn't match its recorded hash (partial/corrupt).
+    """
+    body_path, meta_path = _cache_paths(cache_key)
+    meta = load_json(meta_path, {})
+    if not isinstance(meta, dict) or not (meta.get("etag") or meta.get("last_modified")):
+        return {}
+    try:
+        with open(body_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return {}
+    if digest != meta.get("sha256"):
+        return {}
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def _cache_store(cache_key: str, tmp_body_path: str, sha256: str, resp_headers: http.client.HTTPMessage) -> None:
+    """
+    Move a fully downloaded body into the cache and record its validators.
+    """
+    body_path, meta_path = _cache_paths(cache_key)
+    os.replace(tmp_body_path, body_path)
+    write_json(meta_path, {
+        "etag": resp_headers.get("ETag"),
+        "last_modified": resp_headers.get("Last-Modified"),
+        "sha256": sha256,
+    })
+
+
+def _cache_write_body(cache_key: str, body: bytes, resp_headers: http.client.HTTPMessage) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = _cache_paths(cache_key)[0] + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(body)
+    _cache_store(cache_key, tmp, hashlib.sha256(body).hexdigest(), resp_headers)
+
+
+def http_json(
+    url: str,
+    timeout: int = HTTP_TIMEOUT,
+    attempts: int = 4,
+    cache_key: Optional[str] = None,
+) -> Any:
+    """
+    Fetch JSON with retries/backoff (see http_get).
+    cache_key: keep the body in CACHE_DIR and refetch conditionally; on 304
+    the cached copy is parsed instead.
+    """
+    if cache_key is None:
+        body, _ = http_get(url, timeout, attempts)
+        return json_loads(body)
+
+    cond = _cache_request_headers(cache_key)
+    try:
+        body, resp_headers = http_get(url, timeout, attempts, headers=cond)
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cond:
+            with open(_cache_paths(cache_key)[0], "rb") as f:
+                return json_loads(f.read())
+        raise
+
+    payload = json_loads(body)
+    _cache_write_body(cache_key, body, resp_headers)
+    return payload
+
+
+class _TeeReader:
+    """
+    File-like wrapper that copies everything read into `sink` (and hashes it).
+    """
+
+    def __init__(self, fp: Any, sink: Any):
+        self.fp = fp
+        self.sink = sink
+        self.sha256 = hashlib.sha256()
+
+    def read(self, n: int = -1) -> bytes:
+        b = self.fp.read(n)
+        self.sink.write(b)
+        self.sha256.update(b)
+        return b
+
+
+def http_stream_items(
+    url: str,
+    prefix: str,
+    timeout: int = HTTP_TIMEOUT,
+    attempts: int = 4,
+    cache_key: Optional[str] = None,
+    _redirects: int = 0,
+) -> Iterator[Any]:
+    """
+    Stream the JSON array at `prefix` (ijson path, e.g. "relics.item") one item
+    at a time while the body is still downloading. Requires ijson.
+    Retries only cover getting a 2xx response; once items flow, errors propagate.
+    cache_key: as in http_json; the body is teed into the cache while streaming
+    and a 304 streams the cached copy instead.
+    """
+    host, path = _split_url(url)
+    cond = _cache_request_headers(cache_key) if cache_key else {}
+    req_headers = {**DEFAULT_HEADERS, **cond}
+    last_err = None
+    for i in range(attempts):
+        # Dedicated connection: the body is consumed lazily by the caller
+        conn = http.client.HTTPSConnection(host, timeout=timeout)
+        location = None
+        try:
+            conn.request("GET", path, headers=req_headers)
+            r = conn.getresponse()
+            if r.status in (301, 302, 303, 307, 308) and r.getheader("Location"):
+                if _redirects >= MAX_REDIRECTS:
+                    raise urllib.error.HTTPError(url, r.status, "too many redirects", r.headers, None)
+                location = urllib.parse.urljoin(url, r.getheader("Location"))
+            elif not (r.status == 304 and cond) and not 200 <= r.status < 300:
+                raise urllib.error.HTTPError(url, r.status, r.reason, r.headers, None)
 
         except urllib.error.HTTPError as e:
+            conn.close()
             last_err = e
             if e.code in (429, 500, 502, 503, 504):
-                time.sleep(1.5 ** i)
+                _backoff(i, e, final=i == attempts - 1)
                 continue
             raise
 
         except Exception as e:
+            conn.close()
             last_err = e
-            time.sleep(1.5 ** i)
+            _backoff(i, final=i == attempts - 1)
+            continue
+
+        # Items are yielded only past this point, outside the retry handling:
+        # once they flow, errors propagate instead of restarting the stream.
+        if location is not None:
+            conn.close()
+            yield from http_stream_items(location, prefix, timeout, attempts, cache_key, _redirects + 1)
+            return
+        if r.status == 304:
+            conn.close()
+            with open(_cache_paths(cache_key)[0], "rb") as f:
+                yield from ijson.items(f, prefix, use_float=True)
+            return
+
+        try:
+            fp = gzip.GzipFile(fileobj=r) if (r.getheader("Content-Encoding") or "").lower() == "gzip" else r
+            if not cache_key:
+                yield from ijson.items(fp, prefix, use_float=True)
+                return
+
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = _cache_paths(cache_key)[0] + ".tmp"
+            with open(tmp, "wb") as sink:
+                tee = _TeeReader(fp, sink)
+                yield from ijson.items(tee, prefix, use_float=True)
+                while tee.read(65536):  # rest of the document, so the cached copy is complete
+                    pass
+            _cache_store(cache_key, tmp, tee.sha256.hexdigest(), r.headers)
+        finally:
+            conn.close()
+        return
 
     if last_err:
         raise last_err
-    raise RuntimeError("http_json failed with unknown error")
+    raise RuntimeError("http_stream_items failed with unknown error")
 
 
 # -------------------- Relics parsing --------------------
@@ -95,7 +560,7 @@ def build_vaulted_map() -> Dict[str, bool]:
     Map "Axi A1" -> vaulted True/False from WFCD warframe-relic-data (limited list).
     """
     try:
-        payload = http_json(RELICS_VAULT_MAP_URL)
+        payload = http_json(RELICS_VAULT_MAP_URL, cache_key="vault")
     except Exception:
         return {}
 
@@ -111,8 +576,26 @@ def build_vaulted_map() -> Dict[str, bool]:
     return m
 
 
-def build_relics_min() -> List[Dict[str, Any]]:
+def iter_relics_all() -> Iterator[Any]:
+    """
+    Yield the entries of relics.json's "relics" array.
+    With ijson they are parsed as the download progresses; otherwise the
+    whole document is loaded first.
+    """
+    if ijson is not None:
+        yield from http_stream_items(RELICS_ALL_URL, "relics.item", cache_key="relics")
+        return
+
+    payload = http_json(RELICS_ALL_URL, cache_key="relics")
+    if not isinstance(payload, dict) or "relics" not in payload or not isinstance(payload["relics"], list):
+        raise RuntimeError("Unexpected format for relics.json (expected { relics: [...] }).")
+    yield from payload["relics"]
+
+
+def build_relics_min() -> Tuple[List[Dict[str, Any]], List[str]]:
     """
+    Returns (relics, sorted unique reward item names).
+
     Writes data/Relics.min.json in UI-friendly format:
     [
       {"tier":"Axi","name":"A1","vaulted":true,"rewards":[{"item":"...","chance":25.33,"type":"Uncommon"}, ...]},
@@ -122,58 +605,54 @@ def build_relics_min() -> List[Dict[str, Any]]:
     Source: WFCD warframe-drop-data relics.json (ALL relics).
     Keep ONLY state == "Intact" to avoid duplicates of Exceptional/Flawless/Radiant.
     """
-    print("Downloading ALL relics (WFCD warframe-drop-data /data/relics.json)...")
-    payload = http_json(RELICS_ALL_URL)
-
-    if not isinstance(payload, dict) or "relics" not in payload or not isinstance(payload["relics"], list):
-        raise RuntimeError("Unexpected format for relics.json (expected { relics: [...] }).")
-
     vault_map = build_vaulted_map()
     if vault_map:
         print(f"Vault map loaded: {len(vault_map)} entries")
     else:
         print("Vault map not available (will default unknown relics to vaulted=True).")
 
+    print("Downloading ALL relics (WFCD warframe-drop-data /data/relics.json)...")
+
     out: List[Dict[str, Any]] = []
     seen = set()
+    unique_items = set()
 
-    for r in payload["relics"]:
-        if not isinstance(r, dict):
-            continue
-
-        if (r.get("state") or "").strip() != "Intact":
+    for r in iter_relics_all():
+        # WFCD's schema is stable: index it directly and skip whatever doesn't fit
+        try:
+            if r["state"].strip() != "Intact":
+                continue
+            tier = r["tier"].strip()
+            code = r["relicName"].strip()
+            rewards = r["rewards"]
+        except (KeyError, AttributeError, TypeError):
             continue
-
-        tier = (r.get("tier") or "").strip()
-        code = (r.get("relicName") or "").strip()
-        if not tier or not code:
+        if not tier or not code or not rewards or not isinstance(rewards, list):
             continue
 
-        full_name = f"{tier} {code}".strip()
+        full_name = f"{tier} {code}"
         if full_name in seen:
             continue
         seen.add(full_name)
 
-        rewards = r.get("rewards") or []
-        if not isinstance(rewards, list) or not rewards:
-            continue
-
         out_rewards = []
         for rw in rewards:
-            if not isinstance(rw, dict):
+            try:
+                item = (rw.get("itemName") or rw.get("item") or rw.get("name")).strip()
+                rtype = (rw.get("rarity") or rw.get("type") or "").strip()
+            except (AttributeError, TypeError):
                 continue
-            item = (rw.get("itemName") or rw.get("item") or rw.get("name") or "").strip()
             if not item:
                 continue
 
             chance = rw.get("chance")
             try:
                 chance = float(chance) if chance is not None else None
-            except Exception:
+            except (TypeError, ValueError):
                 chance = None
 
-            rtype = (rw.get("rarity") or rw.get("type") or "").strip()
             out_rewards.append({"item": item, "chance": chance, "type": rtype})
+            unique_items.add(item)
 
         if not out_rewards:
             continue
@@ -182,36 +661,25 @@ def build_relics_min() -> List[Dict[str, Any]]:
 
         out.append({"tier": tier, "name": code, "vaulted": vaulted, "rewards": out_rewards})
 
-    def sort_key(x: Dict[str, Any]) -> Tuple[int, str]:
-        t = x.get("tier") or ""
-        n = x.get("name") or ""
-        return (TIER_ORDER.get(t, 99), n)
-
-    out.sort(key=sort_key)
+    # tier/name are always set non-empty above, so no .get()/defaults needed
+    out.sort(key=lambda x: (TIER_ORDER.get(x["tier"], 99), x["name"]))
 
     ensure_data_dir()
-    with open(RELICS_OUT, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, separators=(",", ":"))
+    write_json(RELICS_OUT, out)
 
     print(f"Relics written: {len(out)} -> {RELICS_OUT}")
 
     if len(out) == 0:
         raise RuntimeError("Relics list is empty after parsing. Aborting so we don't publish [].")
 
-    return out
+    return out, sorted(unique_items)
 
 
-def unique_reward_items(relics_min: List[Dict[str, Any]]) -> List[str]:
-    s = set()
-    for r in relics_min:
-        for rw in r.get("rewards", []):
-            it = rw.get("item")
-            if it:
-                s.add(it)
-    return sorted(s)
+# -------------------- Warframe.market pricing --------------------
 
+_NONALNUM = re.compile(r"[^a-z0-9]+")
+_MULTIUNDER = re.compile(r"_+")
 
-# -------------------- Warframe.market pricing --------------------
 
 def guess_wm_url_name(item_name: str) -> str:
     """
@@ -219,9 +687,10 @@ def guess_wm_url_name(item_name: str) -> str:
       lowercase + underscores, stripping punctuation.
     """
     s = (item_name or "").strip().lower()
-    s = s.replace("&", "and")
-    s = re.sub(r"[^a-z0-9]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
+    if "&" in s:
+        s = s.replace("&", "and")
+    s = _NONALNUM.sub("_", s)
+    s = _MULTIUNDER.sub("_", s).strip("_")
     return s
 
 
@@ -239,6 +708,11 @@ def wm_url_candidates(item_name: str) -> List[str]:
       receiver -> reciever  (known WM typo on some items)
     """
     base = WM_URL_OVERRIDES.get(item_name) or guess_wm_url_name(item_name)
+
+    # Common case: no "receiver" at all, so only one candidate
+    if "_receiver" not in base:
+        return [base] if base else []
+
     cands = [base]
 
     # Known WM typo: receiver -> reciever
@@ -263,101 +737,263 @@ def _median_from_stats_section(stats_section: Any, window_key: str) -> Optional[
     """
     stats_section = payload['statistics_closed'] or payload['statistics_open']
     window_key: '90days' or '48hours'
+    Median of the newest entry; None if anything along the way is missing/odd.
     """
-    if not isinstance(stats_section, dict):
-        return None
-    arr = stats_section.get(window_key) or []
-    if not isinstance(arr, list) or not arr:
-        return None
-    last = arr[-1]
-    if not isinstance(last, dict):
-        return None
-    med = last.get("median")
-    if med is None:
-        return None
     try:
-        return int(round(float(med)))
-    except Exception:
+        return int(round(float(stats_section[window_key][-1]["median"])))
+    except (TypeError, KeyError, IndexError, ValueError, OverflowError):
         return None
 
 
-def wm_price_from_statistics(url_name: str) -> Optional[int]:
+# (section, window) in the order wm_price_from_statistics tries them
+_WM_STATS_FALLBACKS = (
+    ("statistics_closed", "90days"),
+    ("statistics_open", "90days"),
+    ("statistics_closed", "48hours"),
+    ("statistics_open", "48hours"),
+)
+
+
+def wm_price_from_statistics(url_name: str, validators: Optional[Dict[str, str]] = None) -> Optional[int]:
     """
     Primary: statistics_closed 90days median
     Fallback 1: statistics_open 90days median
     Fallback 2: statistics_closed 48hours median
     Fallback 3: statistics_open 48hours median
+
+    validators: {"etag", "last_modified"} from a previous fetch of this url_name.
+    They are sent as If-None-Match / If-Modified-Since (a 304 raises HTTPError),
+    and the dict is updated in place with the new response's values.
+
+    Returns None only for a valid payload without a usable median. HTTP errors
+    (404 = no such slug, 403 = WAF/IP block, ...) raise HTTPError and a
+    malformed payload raises ValueError, so callers can tell them apart.
     """
-    url = WM_ITEM_STATS.format(url_name=urllib.parse.quote(url_name))
-    try:
-        payload = http_json(url)
-    except urllib.error.HTTPError as e:
-        if e.code in (404, 403):
-            return None
-        raise
+    # url_name is a WM slug ([a-z0-9_]), so it needs no percent-encoding
+    assert url_name.isascii(), url_name
+    url = WM_ITEMS_PREFIX + url_name + "/statistics"
+    headers: Dict[str, str] = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    body, resp_headers = http_get(url, headers=headers, limiter=wm_bucket)
+
+    if validators is not None:
+        validators.clear()
+        if resp_headers.get("ETag"):
+            validators["etag"] = resp_headers["ETag"]
+        if resp_headers.get("Last-Modified"):
+            validators["last_modified"] = resp_headers["Last-Modified"]
 
     try:
-        p = payload.get("payload", {})
-        closed = p.get("statistics_closed")
-        open_ = p.get("statistics_open")
-
-        v = _median_from_stats_section(closed, "90days")
+        p = json_loads(body)["payload"]
+    except (TypeError, KeyError) as e:
+        raise ValueError(f"Unexpected WM statistics payload for {url_name}") from e
+    if not isinstance(p, dict):
+        raise ValueError(f"Unexpected WM statistics payload for {url_name}")
+
+    for section, window in _WM_STATS_FALLBACKS:
+        v = _median_from_stats_section(p.get(section), window)
         if v is not None:
             return v
+    return None
 
-        v = _median_from_stats_section(open_, "90days")
-        if v is not None:
-            return v
 
-        v = _median_from_stats_section(closed, "48hours")
-        if v is not None:
-            return v
+def price_one(
+    item_name: str,
+    prior_price: Optional[int] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, Optional[int], Dict[str, Any]]:
+    """
+    Try candidate slugs until one returns a price.
+    Returns (item_name, price, meta entry for prices.meta.json).
+    If every candidate was checked and WM confirmed none has a price (404, or
+    a valid payload without a median), price is None and meta is the
+    wm_missing.json entry instead. Blocked (403), transient or malformed
+    responses keep any prior price and are never negative-cached; a prior
+    price is only dropped when every candidate 404s.
+
+    With a prior price: skip WM entirely while it is fresh, otherwise do a
+    conditional refetch (304 keeps the prior price). REFRESH_FRACTION of items
+    ignore the cache so staleness stays bounded. The slug recorded in meta is
+    tried first either way.
+    """
+    meta = meta or {}
+    use_cache = prior_price is not None and random.random() >= REFRESH_FRACTION
+    if use_cache and time.time() - meta.get("ts", 0) < PRICE_FRESH_SECONDS:
+        return item_name, prior_price, meta
+
+    cands = wm_url_candidates(item_name)
+    # The slug that priced this item last time goes first, so items needing the
+    # "reciever" fallback don't pay a 404 on the first candidate every refetch.
+    known = meta.get("url_name")
+    if known in cands and known != cands[0]:
+        order = [known] + [c for c in cands if c != known]
+    else:
+        order = cands
 
-        v = _median_from_stats_section(open_, "48hours")
-        if v is not None:
-            return v
+    all_404 = True
+    for url_name in order:
+        validators: Dict[str, str] = {}
+        if use_cache and meta.get("url_name") == url_name:
+            validators = {k: meta[k] for k in ("etag", "last_modified") if meta.get(k)}
 
-        return None
-    except Exception:
-        return None
+        try:
+            v = wm_price_from_statistics(url_name, validators)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return item_name, prior_price, {**meta, "ts": time.time()}
+            if e.code == 404:
+                continue  # no such slug on WM; try the next candidate
+            if e.code in (403, 429, 500, 502, 503, 504):
+                # 403 is the WAF/IP block (not "item missing"), the rest are transient —
+                # slow everyone down and give up on this item for now (keep any prior price)
+                wm_bucket.penalize(WM_ERROR_PENALTY)
+                return item_name, prior_price, meta
+            raise
+        except ValueError:
+            # malformed payload: no proof the item is missing
+            return item_name, prior_price, meta
 
+        if v is not None:
+            return item_name, v, {"url_name": url_name, **validators, "ts": time.time()}
+        all_404 = False
 
-def build_prices_from_wm_statistics(relics_min: List[Dict[str, Any]]) -> Tuple[Dict[str, int], List[str]]:
-    reward_items = unique_reward_items(relics_min)
-    print(f"Unique reward items to price: {len(reward_items)}")
+    if prior_price is not None and not all_404:
+        # WM still lists the item, it just has no median right now: keep the old price
+        return item_name, prior_price, meta
+    return item_name, None, {"slugs": cands, "ts": time.time()}
 
-    prices: Dict[str, int] = {}
-    missing_items: List[str] = []
 
-    for i, item_name in enumerate(reward_items, start=1):
-        v: Optional[int] = None
+def load_partial_prices() -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    """
+    {item: (price, meta)} from PRICES_PARTIAL_OUT. A torn last line is ignored.
+    """
+    out: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    try:
+        with open(PRICES_PARTIAL_OUT, "rb") as f:
+            for line in f:
+                try:
+                    rec = json_loads(line)
+                    out[rec["item"]] = (rec["price"], rec.get("meta") or {})
+                except (ValueError, TypeError, KeyError):
+                    continue
+    except OSError:
+        pass
+    return out
 
-        # Try candidate slugs until one returns a price
-        for url_name in wm_url_candidates(item_name):
-            try:
-                v = wm_price_from_statistics(url_name)
-            except urllib.error.HTTPError as e:
-                if e.code in (429, 500, 502, 503, 504):
-                    # transient — wait a bit and give up on this item for now
-                    time.sleep(1.25)
-                    v = None
-                    break
-                raise
 
-            if v is not None:
-                break
+def build_prices_from_wm_statistics(
+    reward_items: List[str],
+    prior: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict[str, int], List[str]]:
+    """
+    reward_items: unique reward item names (from build_relics_min).
+    prior: prices.json from the previous run (see price_one for how it's used).
+    Also rewrites prices.meta.json and wm_missing.json for the next run, but
+    only after the "too few prices" check passes (it raises RuntimeError), so a
+    failed run leaves the previous cache state alone.
+    Items in wm_missing.json are skipped (no WM call) until the entry is
+    WM_MISSING_TTL_SECONDS old or their candidate slugs change.
+    Each new price is appended to PRICES_PARTIAL_OUT as it arrives; items
+    already in that file (from an interrupted run) are not priced again.
+    """
+    print(f"Unique reward items to price: {len(reward_items)}")
 
-        if v is None:
-            missing_items.append(item_name)
-        else:
-            prices[item_name] = v
+    prior = prior or {}
+    prior_meta: Dict[str, Any] = {}
+    if prior:
+        loaded_meta = load_json(PRICES_META_OUT, {})
+        if isinstance(loaded_meta, dict):
+            # A malformed entry is treated like a missing one (plain refetch)
+            prior_meta = {k: e for k, e in loaded_meta.items() if isinstance(e, dict)}
+    if prior:
+        print(f"Prior prices loaded: {len(prior)} (meta for {len(prior_meta)})")
 
-        if i % 25 == 0:
-            print(f"  {i}/{len(reward_items)} priced={len(prices)} missing={len(missing_items)}")
+    prices: Dict[str, int] = {}
+    missing_items: List[str] = []
+    meta: Dict[str, Any] = {}
+
+    known_missing: Dict[str, Any] = {}
+    prior_missing = load_json(WM_MISSING_OUT, {})
+    if isinstance(prior_missing, dict):
+        now = time.time()
+        for item_name in reward_items:
+            e = prior_missing.get(item_name)
+            if (
+                isinstance(e, dict)
+                and now - e.get("ts", 0) < WM_MISSING_TTL_SECONDS
+                and e.get("slugs") == wm_url_candidates(item_name)
+            ):
+                known_missing[item_name] = e
+    if known_missing:
+        print(f"Skipping {len(known_missing)} items known missing on WM")
+    missing_items.extend(known_missing)
+    missing_cache: Dict[str, Any] = dict(known_missing)
+
+    resumed = load_partial_prices()
+    for item_name in reward_items:
+        if item_name in resumed and item_name not in known_missing:
+            prices[item_name], meta[item_name] = resumed[item_name]
+    if prices:
+        print(f"Resuming: {len(prices)} items already priced in {PRICES_PARTIAL_OUT}")
+
+    to_price = [it for it in reward_items if it not in known_missing and it not in prices]
+    ensure_data_dir()
+    with open(PRICES_PARTIAL_OUT, "ab") as partial, ThreadPoolExecutor(max_workers=WM_WORKERS) as pool:
+        if partial.tell():
+            partial.write(b"\n")  # terminate a possibly torn last line (blank lines are skipped)
+        futures = [
+            pool.submit(price_one, item_name, prior.get(item_name), prior_meta.get(item_name))
+            for item_name in to_price
+        ]
+
+        def record(item_name: str, v: Optional[int], m: Dict[str, Any]) -> None:
+            if v is None:
+                missing_items.append(item_name)
+                if m.get("slugs"):
+                    missing_cache[item_name] = m
+            else:
+                prices[item_name] = v
+                if m:
+                    meta[item_name] = m
+                partial.write(json_dumps({"item": item_name, "price": v, "meta": m}) + b"\n")
+                partial.flush()
+
+        recorded = set()
+        try:
+            for i, fut in enumerate(as_completed(futures), start=1):
+                record(*fut.result())
+                recorded.add(fut)
+
+                if i % 25 == 0:
+                    print(f"  {i}/{len(to_price)} priced={len(prices)} missing={len(missing_items)}")
+        except BaseException:
+            # A fatal error ends the run: don't keep calling WM for the queued items,
+            # but keep what the in-flight ones still price for the next run to resume from
+            pool.shutdown(wait=True, cancel_futures=True)
+            for fut in futures:
+                if fut not in recorded and fut.done() and not fut.cancelled() and fut.exception() is None:
+                    record(*fut.result())
+            raise
 
-        time.sleep(SLEEP_BETWEEN_WM_CALLS)
+    # Workers finish out of order; keep output stable (same order as reward_items)
+    prices = {k: prices[k] for k in reward_items if k in prices}
+    meta = {k: meta[k] for k in prices if k in meta}
+    missing_cache = {k: missing_cache[k] for k in reward_items if k in missing_cache}
 
     print(f"WM pricing done: {len(prices)}/{len(reward_items)} priced. Missing={len(missing_items)}")
+
+    # Safety: if something went wrong and we priced almost nothing, fail the workflow
+    if len(prices) < 25:
+        raise RuntimeError(
+            f"Too few prices ({len(prices)}). warframe.market calls may be failing, or endpoint changed."
+        )
+
+    write_json(PRICES_META_OUT, meta)
+    write_json(WM_MISSING_OUT, missing_cache)
     return prices, missing_items
 
 
@@ -371,8 +1007,7 @@ def write_missing_debug(missing_items: List[str]) -> None:
             f.write(name + "\n")
 
     # JSON for future tooling
-    with open(MISSING_JSON, "w", encoding="utf-8") as f:
-        json.dump(missing_sorted, f, ensure_ascii=False, indent=2)
+    write_json(MISSING_JSON, missing_sorted, pretty=True)
 
     print(f"Missing prices written: {len(missing_sorted)} -> {MISSING_TXT} (+ {MISSING_JSON})")
 
@@ -380,22 +1015,23 @@ def write_missing_debug(missing_items: List[str]) -> None:
 # -------------------- Main --------------------
 
 def main():
-    relics_min = build_relics_min()
+    _, reward_items = build_relics_min()
 
-    prices, missing_items = build_prices_from_wm_statistics(relics_min)
+    prior = load_json(PRICES_OUT, {})
+    if not isinstance(prior, dict):
+        prior = {}
+    # Raises (before writing anything) if too few items could be priced
+    prices, missing_items = build_prices_from_wm_statistics(reward_items, prior)
 
     ensure_data_dir()
-    with open(PRICES_OUT, "w", encoding="utf-8") as f:
-        json.dump(prices, f, ensure_ascii=False, separators=(",", ":"))
+    write_json(PRICES_OUT, prices)
     print(f"Prices written: {len(prices)} -> {PRICES_OUT}")
 
     write_missing_debug(missing_items)
 
-    # Safety: if something went wrong and we priced almost nothing, fail the workflow
-    if len(prices) < 25:
-        raise RuntimeError(
-            f"Too few prices ({len(prices)}). warframe.market calls may be failing, or endpoint changed."
-        )
+    # Every output is written; only now is the progress log no longer needed
+    if os.path.exists(PRICES_PARTIAL_OUT):
+        os.remove(PRICES_PARTIAL_OUT)
 
     print("Done.")
 